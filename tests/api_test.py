@@ -2,11 +2,14 @@ from __future__ import annotations
 
 import geoviews as gv
 import holoviews as hv
+import numpy as np
 import pytest
+import xarray as xr
 
 from . import DATA_DIR
 from thalassa import api
 from thalassa import normalization
+from thalassa import utils
 
 ADCIRC_NC = DATA_DIR / "fort.63.nc"
 SELAFIN = DATA_DIR / "iceland.slf"
@@ -61,3 +64,113 @@ def test_get_tiles():
     tiles = api.get_tiles()
     hv.render(tiles, backend="bokeh")
     assert isinstance(tiles, gv.WMTS), type(tiles)
+
+
+def test_create_trimesh_is_cached():
+    ds = api.open_dataset(ADCIRC_NC)
+    assert api.create_trimesh(ds, variable="zeta") is api.create_trimesh(ds, variable="zeta")
+    assert api.create_trimesh(ds, variable="zeta") is not api.create_trimesh(ds)
+
+
+def test_create_trimesh_is_recreated_when_the_variable_is_replaced():
+    ds = api.open_dataset(ADCIRC_NC).isel(time=0)
+    trimesh = api.create_trimesh(ds, variable="zeta")
+    ds["zeta"] = xr.full_like(ds.zeta, 42)
+    new_trimesh = api.create_trimesh(ds, variable="zeta")
+    assert new_trimesh is not trimesh
+    assert (new_trimesh.nodes.data.zeta == 42).all()
+
+
+def test_create_trimesh_drops_scalar_coords():
+    ds = api.open_dataset(ADCIRC_NC).isel(time=0)
+    trimesh = api.create_trimesh(ds, variable="zeta")
+    assert "time" not in trimesh.nodes.data.columns
+
+
+def test_create_trimesh_time_dependent_variable():
+    ds = api.open_dataset(SELAFIN)
+    trimesh = api.create_trimesh(ds, variable="S")
+    columns = ["lon", "lat", "S"]
+    expected = ds[columns].reset_coords()[columns].to_dataframe()
+    transformer = api._get_transformer(from_crs="EPSG:4326", to_crs="EPSG:3857")
+    expected["lon"], expected["lat"] = transformer.transform(expected.lon, expected.lat)
+    assert np.allclose(trimesh.nodes.data[columns].values, expected.values, equal_nan=True)
+
+
+def test_create_trimesh_is_projected_once():
+    from cartopy import crs
+
+    ds = api.open_dataset(ADCIRC_NC).isel(time=0)
+    trimesh = api.create_trimesh(ds, variable="zeta")
+    assert trimesh.crs == crs.GOOGLE_MERCATOR
+    # Projecting to Web Mercator again is a no-op
+    projected = gv.project(trimesh)
+    columns = ["lon", "lat"]
+    assert (projected.nodes.data[columns].values == trimesh.nodes.data[columns].values).all()
+
+
+def test_tap_timeseries_callback():
+    ds = api.open_dataset(ADCIRC_NC)
+    raster = api.get_raster(ds.isel(time=0), variable="zeta")
+    tap_ts = api.get_tap_timeseries(ds, "zeta", raster)
+    hv.render(raster, backend="bokeh")
+    hv.render(tap_ts, backend="bokeh")
+    # The coordinates of the stream are in Web Mercator
+    x, y = api._get_transformer().transform(float(ds.lon[100]), float(ds.lat[100]))
+    curve = tap_ts.callback.callable(x=x, y=y)
+    assert isinstance(curve, hv.Curve)
+    assert "Node=100" in curve.opts.get().kwargs["title"]
+    assert (curve.dimension_values("zeta") == ds.zeta.isel(node=100).values).all()
+    assert curve.vdims[0].unit == "m"
+    # The KDTree is cached against the user's dataset, not against a temporary subset
+    assert "kdtree" in utils.get_dataset_cache(ds)
+
+
+def test_tap_timeseries_callback_on_node_without_data():
+    ds = api.open_dataset(ADCIRC_NC)
+    raster = api.get_raster(ds.isel(time=0), variable="zeta")
+    tap_ts = api.get_tap_timeseries(ds, "zeta", raster)
+    # The mesh polygon is generated before any event gets handled
+    assert "mesh_polygon" in utils.get_dataset_cache(ds)
+    tap_ts.callback.callable(x=0, y=0)  # initial render
+    # Node 2556 is NaN at all timestamps. Use a point inside one of its triangles, since
+    # the points on the boundary of the mesh are not considered to be inside it.
+    assert np.isnan(ds.zeta.isel(node=2556)).all()
+    lon, lat = -72.49356, 40.83550
+    assert utils.is_point_in_the_mesh(ds, lon=lon, lat=lat)
+    assert utils.get_index_of_nearest_node(ds, lon=lon, lat=lat) == 2556
+    x, y = api._get_transformer().transform(lon, lat)
+    curve = tap_ts.callback.callable(x=x, y=y)
+    assert curve.opts.get().kwargs["title"] == "Please click on the map!"
+    assert len(curve) == 0
+
+
+def test_get_raster_is_float32():
+    ds = api.open_dataset(ADCIRC_NC).isel(time=0)
+    raster = api.get_raster(ds, variable="zeta")
+    hv.render(raster, backend="bokeh")
+    image = raster[()]
+    assert all(var.dtype == "float32" for var in image.data.data_vars.values())
+
+
+def test_create_trimesh_reuses_projected_nodes():
+    ds = api.open_dataset(ADCIRC_NC).isel(time=0)
+    assert api._get_projected_nodes(ds) is api._get_projected_nodes(ds)
+    mesh = api.create_trimesh(ds)
+    trimesh = api.create_trimesh(ds, variable="zeta")
+    columns = ["lon", "lat"]
+    assert (mesh.nodes.data[columns].values == trimesh.nodes.data[columns].values).all()
+    assert np.array_equal(trimesh.nodes.data.zeta.values, ds.zeta.values, equal_nan=True)
+
+
+def test_pointer_timeseries_renders_the_latest_position():
+    ds = api.open_dataset(ADCIRC_NC)
+    raster = api.get_raster(ds.isel(time=0), variable="zeta")
+    pointer_ts = api.get_pointer_timeseries(ds, "zeta", raster, title_template="Node={node_index}")
+    pointer_ts.callback.callable(x=0, y=0)  # initial render
+    # Consecutive mouse movements; the curve must follow the pointer
+    for node_index in (200, 100):
+        x, y = api._get_transformer().transform(float(ds.lon[node_index]), float(ds.lat[node_index]))
+        curve = pointer_ts.callback.callable(x=x, y=y)
+    assert curve.opts.get().kwargs["title"] == "Node=100"
+    assert np.array_equal(curve.dimension_values("zeta"), ds.zeta.isel(node=100).values, equal_nan=True)
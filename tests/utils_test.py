@@ -141,3 +141,156 @@ def test_generate_mesh_polygon():
     )
     gdf = utils.generate_mesh_polygon(ds)
     assert gdf.geometry[0].area == 4
+    assert gdf.crs == "EPSG:4326"
+
+
+def test_get_index_of_nearest_node():
+    ds = utils.generate_thalassa_ds(
+        nodes=range(4),
+        triface_nodes=[[0, 1, 2], [1, 2, 3]],
+        lons=[10, 10, 12, 12],
+        lats=[20, 22, 20, 22],
+    )
+    assert utils.get_index_of_nearest_node(ds, lon=11.9, lat=21.8) == 3
+    assert utils.get_index_of_nearest_node(ds, lon=10.1, lat=20.2) == 0
+    # The KDTree is cached per dataset
+    assert utils._get_kdtree(ds) is utils._get_kdtree(ds)
+
+
+def test_cache_is_invalidated_when_variables_are_replaced():
+    ds = utils.generate_thalassa_ds(
+        nodes=range(4),
+        triface_nodes=[[0, 1, 2], [1, 2, 3]],
+        lons=[10, 10, 12, 12],
+        lats=[20, 22, 20, 22],
+    )
+    kdtree = utils._get_kdtree(ds)
+    polygon = utils._get_cached_mesh_polygon(ds)
+    ds["lon"] = ds.lon + 5
+    assert utils._get_kdtree(ds) is not kdtree
+    assert utils.get_index_of_nearest_node(ds, lon=16.9, lat=21.8) == 3
+    assert utils.is_point_in_the_mesh(ds, lon=16, lat=21)
+    assert not utils.is_point_in_the_mesh(ds, lon=11, lat=21)
+    assert utils._get_cached_mesh_polygon(ds) is not polygon
+    # Unrelated variables don't invalidate the cache
+    ds["foo"] = ds.lon * 2
+    assert utils._get_cached_mesh_polygon(ds) is utils._get_cached_mesh_polygon(ds)
+
+
+def test_generate_mesh_polygon_with_hole():
+    # A 3x3 grid of unit squares without the central square
+    lons, lats = np.meshgrid(np.arange(4), np.arange(4))
+    indices = np.arange(16).reshape(4, 4)
+    triface_nodes = []
+    for i in range(3):
+        for j in range(3):
+            if (i, j) == (1, 1):
+                continue
+            a, b, c, d = indices[i, j], indices[i, j + 1], indices[i + 1, j], indices[i + 1, j + 1]
+            triface_nodes.extend([[a, b, c], [b, d, c]])
+    ds = utils.generate_thalassa_ds(
+        nodes=range(16),
+        triface_nodes=triface_nodes,
+        lons=lons.ravel().tolist(),
+        lats=lats.ravel().tolist(),
+    )
+    gdf = utils.generate_mesh_polygon(ds)
+    polygon = gdf.geometry[0]
+    assert polygon.geom_type == "Polygon"
+    assert polygon.area == 8
+    assert len(polygon.interiors) == 1
+
+
+def test_get_triangle_coords():
+    ds = utils.generate_thalassa_ds(
+        nodes=range(4),
+        triface_nodes=[[0, 1, 2], [1, 2, 3]],
+        lons=[10, 10, 12, 12],
+        lats=[20, 22, 20, 22],
+    )
+    coords = utils._get_triangle_coords(ds)
+    assert coords.shape == (2, 4, 2)
+    assert np.array_equal(coords[0], [[10, 20], [10, 22], [12, 20], [10, 20]])
+    assert np.array_equal(coords[1], [[10, 22], [12, 20], [12, 22], [10, 22]])
+
+
+def test_is_point_in_the_raster():
+    import holoviews as hv
+
+    ds = api.open_dataset(ADCIRC_NC).isel(time=0)
+    raster = api.get_raster(ds, variable="zeta")
+    hv.render(raster, backend="bokeh")
+    # The coordinates of the raster are in Web Mercator
+    transformer = api._get_transformer(from_crs="EPSG:4326", to_crs="EPSG:3857")
+    assert utils.is_point_in_the_raster(raster, *transformer.transform(-72.4, 40.8))
+    assert not utils.is_point_in_the_raster(raster, *transformer.transform(0, 0))
+
+
+def test_is_point_in_the_mesh():
+    ds = utils.generate_thalassa_ds(
+        nodes=range(4),
+        triface_nodes=[[0, 1, 2], [1, 2, 3]],
+        lons=[10, 10, 12, 12],
+        lats=[20, 22, 20, 22],
+    )
+    assert utils.is_point_in_the_mesh(ds, lon=11, lat=21)
+    assert not utils.is_point_in_the_mesh(ds, lon=13, lat=21)
+
+
+@pytest.mark.parametrize(
+    "triface_nodes,lons,lats,area",
+    [
+        pytest.param(
+            [[0, 1, 2], [0, 3, 4], [3, 1, 4]],
+            [0, 2, 1, 1, 1],
+            [0, 0, -1, 0, 1],
+            2,
+            id="hanging node",
+        ),
+        pytest.param(
+            [[0, 1, 2], [0, 1, 2], [1, 2, 3]],
+            [10, 10, 12, 12],
+            [20, 22, 20, 22],
+            4,
+            id="duplicate triangle",
+        ),
+        pytest.param(
+            [[0, 1, 2], [3, 4, 5]],
+            [0, 4, 0, 1, 5, 1],
+            [0, 0, 4, 1, 1, 5],
+            14,
+            id="overlapping triangles",
+        ),
+    ],
+)
+def test_generate_mesh_polygon_non_conforming_mesh(triface_nodes, lons, lats, area):
+    ds = utils.generate_thalassa_ds(
+        nodes=range(len(lons)),
+        triface_nodes=triface_nodes,
+        lons=lons,
+        lats=lats,
+    )
+    polygon = utils.generate_mesh_polygon(ds).geometry[0]
+    assert polygon.is_valid
+    assert polygon.area == area
+
+
+def test_get_mesh_arrays_are_cached():
+    ds = api.open_dataset(ADCIRC_NC)
+    lons, lats = utils.get_node_coordinates(ds)
+    triface_nodes = utils.get_triface_nodes(ds)
+    assert lons.dtype == lats.dtype == np.float64
+    assert triface_nodes.dtype == np.int32
+    assert lons.flags.c_contiguous and triface_nodes.flags.c_contiguous
+    assert np.array_equal(triface_nodes, ds.triface_nodes.values)
+    assert utils.get_node_coordinates(ds)[0] is lons
+    assert utils.get_triface_nodes(ds) is triface_nodes
+
+
+def test_get_vertices():
+    triface_nodes = np.array([[0, 1, 2], [1, 2, 3]])
+    ds = utils.generate_thalassa_ds(nodes=range(4), triface_nodes=triface_nodes)
+    # The node index is the default one, so the indices are returned as they are
+    assert utils._get_vertices(ds, triface_nodes) is triface_nodes
+    ds = utils.generate_thalassa_ds(nodes=[3, 2, 1, 0], triface_nodes=triface_nodes)
+    assert np.array_equal(utils._get_vertices(ds, triface_nodes), [[3, 2, 1], [2, 1, 0]])
@@ -0,0 +1,27 @@
+"""
+Numba kernels.
+
+This module is imported lazily, so that ``numba`` is only loaded (and the kernels are only compiled)
+when they are actually needed.
+"""
+
+from __future__ import annotations
+
+import numba
+import numpy as np
+import numpy.typing as npt
+
+
+@numba.njit(parallel=True, cache=True, boundscheck=False)  # type: ignore[misc]
+def pack_triangle_coords(
+    vertices: npt.NDArray[np.int_],
+    lons: npt.NDArray[np.float64],
+    lats: npt.NDArray[np.float64],
+    out: npt.NDArray[np.float64],
+) -> None:
+    """Write the closed ring of each triangle of ``vertices`` into the ``(F, 4, 2)`` array ``out``."""
+    for i in numba.prange(vertices.shape[0]):
+        for j in range(4):
+            node = vertices[i, j % 3]
+            out[i, j, 0] = lons[node]
+            out[i, j, 1] = lats[node]
@@ -16,6 +16,8 @@ if T.TYPE_CHECKING:  # pragma: no cover
     import bokeh.models
     import geoviews
     import holoviews
+    import numpy as np
+    import numpy.typing as npt
     import pyproj
     import xarray
     from holoviews.streams import Stream
@@ -115,6 +117,63 @@ def get_dtf() -> DatetimeTickFormatter:
     return dtf
 
 
+def _get_projected_nodes(ds: xarray.Dataset) -> tuple[npt.NDArray[np.float_], npt.NDArray[np.float_]]:
+    """
+    Return the coordinates of the nodes of ``ds`` in Google Mercator.
+
+    Converting the data to Google Mercator makes interactive usage faster.
+    The coordinates are cached, so they only get converted once per dataset.
+    """
+    transformer = _get_transformer(from_crs="EPSG:4326", to_crs="EPSG:3857")
+    projected_nodes = utils.get_cached(
+        ds,
+        "projected_nodes",
+        ["lon", "lat"],
+        lambda: transformer.transform(*utils.get_node_coordinates(ds)),
+    )
+    return T.cast("tuple[npt.NDArray[np.float_], npt.NDArray[np.float_]]", projected_nodes)
+
+
+def _create_trimesh(ds: xarray.Dataset, variable: str) -> geoviews.TriMesh:
+    import geoviews as gv
+    import numpy as np
+    import pandas as pd
+    from cartopy import crs
+
+    # The (projected) coordinates of the nodes are shared by all the variables of the dataset,
+    # therefore we only need to extract the values of the variable.
+    tlon, tlat = _get_projected_nodes(ds)
+    data = {"lon": tlon, "lat": tlat}
+    index: pd.Index[T.Any] | None = ds.get_index("node")
+    if variable and ds[variable].dims != ("node",):
+        # e.g. a time dependent variable. Flatten it and repeat the coordinates of the nodes for
+        # each of its rows, like `to_dataframe()` does, but without building a MultiIndex.
+        dims = [dim for dim in ds[["lon", "lat", variable]].dims if dim in ds[variable].dims]
+        variable_ = ds[variable].variable.transpose(*dims)
+        shape = [-1 if dim == "node" else 1 for dim in variable_.dims]
+        data = {
+            name: np.broadcast_to(coord.reshape(shape), variable_.shape).ravel()
+            for name, coord in data.items()
+        }
+        data[variable] = variable_.values.ravel()
+        index = None
+    elif variable:
+        data[variable] = ds[variable].values
+    # The dataframe just wraps the numpy arrays, i.e. no data gets copied.
+    points_df = pd.DataFrame(data, index=index, copy=False)
+    # Create the geoviews object
+    kwargs = dict(data=points_df, kdims=["lon", "lat"], crs=crs.GOOGLE_MERCATOR)
+    if variable:
+        kwargs["vdims"] = [variable]
+    points_gv = gv.Points(**kwargs)
+    # Create the trimesh
+    if variable:
+        trimesh = gv.TriMesh((utils.get_triface_nodes(ds), points_gv), name=variable)
+    else:
+        trimesh = gv.TriMesh((utils.get_triface_nodes(ds), points_gv))
+    return trimesh
+
+
 def create_trimesh(
     ds_or_trimesh: geoviews.TriMesh | xarray.Dataset,
     variable: str = "",
@@ -122,40 +181,31 @@ def create_trimesh(
     """
     Create a ``geoviews.TriMesh`` object from the provided dataset.
 
+    The trimesh is cached, i.e. subsequent calls with the same dataset and variable
+    return the same object, as long as the variables of the mesh and ``variable`` itself
+    have not been replaced (e.g. with ``ds["zeta"] = ...``) in the meantime.
+
+    !!! note
+
+        Since the same object is returned to all the callers, it should not be modified
+        in place: ``trimesh.opts(...)`` would affect every plot of the trimesh. Use
+        ``trimesh.opts(..., clone=True)`` instead if the options should only apply to a single plot.
+
     Parameters:
         ds_or_trimesh: The dataset containing the variable we want to visualize.
             If a trimesh object is passed, then return it immediately.
         variable: The data variable we want to visualize
     """
     import geoviews as gv
-    from cartopy import crs
 
     if isinstance(ds_or_trimesh, gv.TriMesh):
         # This is already a trimesh, nothing to do
         return ds_or_trimesh
     else:
         ds = ds_or_trimesh
-    # create the trimesh object
-    # Start by getting a "tabular" dataset (i.e. a pandas dataframe).
-    columns = ["lon", "lat"]
-    if variable:
-        columns.append(variable)
-    points_df = ds[columns].to_dataframe()
-    # Convert the data to Google Mercator. This makes interactive usage faster
-    transformer = _get_transformer(from_crs="EPSG:4326", to_crs="EPSG:3857")
-    tlon, tlat = transformer.transform(points_df.lon, points_df.lat)
-    points_df = points_df.assign(lon=tlon, lat=tlat)
-    # Create the geoviews object
-    kwargs = dict(data=points_df, kdims=["lon", "lat"], crs=crs.GOOGLE_MERCATOR)
-    if variable:
-        kwargs["vdims"] = [variable]
-    points_gv = gv.Points(**kwargs)
-    # Create the trimesh
-    if variable:
-        trimesh = gv.TriMesh((ds.triface_nodes.data, points_gv), name=variable)
-    else:
-        trimesh = gv.TriMesh((ds.triface_nodes.data, points_gv))
-    return trimesh
+    variables = [*utils.MESH_VARIABLES, variable] if variable else utils.MESH_VARIABLES
+    trimesh = utils.get_cached(ds, ("trimesh", variable), variables, lambda: _create_trimesh(ds, variable))
+    return T.cast(gv.TriMesh, trimesh)
 
 
 def get_tiles(url: str = "http://c.tile.openstreetmap.org/{Z}/{X}/{Y}.png") -> geoviews.Tiles:
@@ -207,12 +257,18 @@ def get_wireframe(
     y_range: tuple[float, float] | None = None,
     title: str = "Mesh",
     hover: bool = False,
+    pixel_ratio: float | None = 1,
 ) -> geoviews.DynamicMap:
-    """Return a ``DynamicMap`` with a wireframe of the mesh."""
+    """
+    Return a ``DynamicMap`` with a wireframe of the mesh.
+
+    ``pixel_ratio`` is passed to ``rasterize()``. Set it to ``None`` in order to rasterize
+    at the device pixel ratio of the browser, e.g. at 2x the resolution on HiDPI screens.
+    """
     import holoviews.operation.datashader as hv_operation_datashader
 
     trimesh = create_trimesh(ds_or_trimesh)
-    kwargs = dict(element=trimesh.edgepaths, precompute=True)
+    kwargs = dict(element=trimesh.edgepaths, precompute=True, pixel_ratio=pixel_ratio)
     _resolve_ranges(x_range=x_range, y_range=y_range, kwargs=kwargs)
     tools = ["crosshair"]
     if hover:
@@ -225,6 +281,10 @@ def get_wireframe(
     return wireframe
 
 
+def _to_float32(image: holoviews.Image) -> holoviews.Image:
+    return image.clone(data=image.data.astype("float32"))
+
+
 def get_raster(
     ds_or_trimesh: geoviews.TriMesh | xarray.Dataset,
     variable: str = "",
@@ -237,24 +297,35 @@ def get_raster(
     clim_max: float | None = None,
     x_range: tuple[float, float] | None = None,
     y_range: tuple[float, float] | None = None,
+    pixel_ratio: float | None = 1,
 ) -> geoviews.DynamicMap:
     """
     Return a ``DynamicMap`` with a rasterized image of the variable.
 
-    Uses ``datashader`` behind the scenes.
+    Uses ``datashader`` behind the scenes. The cost of the rasterization is proportional to
+    the number of pixels, therefore, by default, we rasterize at the nominal size of the plot.
+    Set ``pixel_ratio`` to ``None`` in order to use the device pixel ratio of the browser instead.
     """
     import holoviews.operation.datashader as hv_operation_datashader
 
     trimesh = create_trimesh(ds_or_trimesh=ds_or_trimesh, variable=variable)
-    kwargs = dict(element=trimesh, precompute=True)
+    # The trimesh has already been projected to Web Mercator by `create_trimesh()`, therefore it
+    # doesn't need to be re-projected on viewport updates and `precompute` can cache the mesh.
+    kwargs = dict(element=trimesh, precompute=True, pixel_ratio=pixel_ratio)
     _resolve_ranges(x_range=x_range, y_range=y_range, kwargs=kwargs)
-    raster = hv_operation_datashader.rasterize(**kwargs).opts(
-        cmap=cmap,
-        clabel=clabel,
-        colorbar=colorbar,
-        clim=(clim_min, clim_max),
-        title=title or trimesh.name,
-        tools=["crosshair", "hover"],
+    # Datashader aggregates in float64. float32 is more than enough for a colormap, and it halves
+    # the size of the image that gets serialized and sent to the browser.
+    raster = (
+        hv_operation_datashader.rasterize(**kwargs)
+        .apply(_to_float32)
+        .opts(
+            cmap=cmap,
+            clabel=clabel,
+            colorbar=colorbar,
+            clim=(clim_min, clim_max),
+            title=title or trimesh.name,
+            tools=["crosshair", "hover"],
+        )
     )
     return raster
 
@@ -286,6 +357,7 @@ def _get_stream_timeseries(
     import geoviews as gv
     import holoviews as hv
     import holoviews.streams as hv_streams
+    import numpy as np
     import pyproj
 
     to_wgs84 = pyproj.Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True).transform
@@ -293,33 +365,53 @@ def _get_stream_timeseries(
     if stream_class not in {hv_streams.Tap, hv_streams.PointerXY}:
         raise ValueError("Unsupported Stream class. Please choose either Tap or PointerXY")
 
+    # Keep a reference to the full dataset; we need the connectivity in order to check if
+    # a point is inside the mesh. The cached node coordinates, KDTree and mesh polygon are
+    # associated with it, too.
+    mesh_ds = ds
     ds = ds[["lon", "lat", variable]]
     hover = get_hover(variable)
     initial_render = True
 
+    # Extract everything that doesn't depend on the selected node only once, as plain numpy arrays.
+    # The values of the variable are kept lazy: only the timeseries of the selected node gets
+    # loaded on each event, since loading the whole `(time, node)` matrix may not fit in memory.
+    data = ds[variable].transpose("time", "node").variable
+    times = ds.time.values
+    lons, lats = utils.get_node_coordinates(mesh_ds)
+    # Generate the (prepared) mesh polygon now; on big meshes this may take a while and we don't
+    # want to block the UI while handling the first event.
+    utils._get_cached_mesh_polygon(mesh_ds)
+    # Use an empty slice in order to retrieve the labels/units of the X and Y axis.
+    empty = hv.Curve(ds[variable].isel(node=0, time=slice(0, 0)))
+    kdims, vdims = empty.kdims, empty.vdims
+
     def callback(x: float, y: float) -> holoviews.Curve:
         logger.debug("tsplot: start - %s, %s", x, y)
         nonlocal initial_render
-        if initial_render or (not utils.is_point_in_the_raster(raster=source_raster, lon=x, lat=y)):
+        x, y = to_wgs84(x, y)
+        if initial_render or (not utils.is_point_in_the_mesh(ds=mesh_ds, lon=x, lat=y)):
             # if the point is not inside the mesh, then display an empty graph
-            # Using slice(0, 0) ensures that there are no data to display but we keep the correct
-            # variable names to display as labels in the X and Y axis.
-            ts = ds.isel(node=0, time=slice(0, 0))
+            plot = empty.clone()
             title = "Please click on the map!"
         else:
-            x, y = to_wgs84(x, y)
-            node_index = utils.get_index_of_nearest_node(ds=ds, lon=x, lat=y)
-            ts = ds.isel(node=node_index)
-            title = title_template.format(
-                lon=float(ts.lon.data),
-                lat=float(ts.lat.data),
-                variable=variable,
-                node_index=node_index,
-            )
+            node_index = utils.get_index_of_nearest_node(ds=mesh_ds, lon=x, lat=y)
+            with utils.timer("tsplot: data loaded ts in"):
+                values = data[:, node_index].values
+            if np.isnan(values).all():
+                # The node has no data at all (e.g. it is always dry), i.e. it is shown as
+                # a blank area on the map. Display an empty graph, too.
+                plot = empty.clone()
+                title = "Please click on the map!"
+            else:
+                plot = hv.Curve((times, values), kdims=kdims, vdims=vdims)
+                title = title_template.format(
+                    lon=float(lons[node_index]),
+                    lat=float(lats[node_index]),
+                    variable=variable,
+                    node_index=node_index,
+                )
         logger.debug("tsplot: title: %s", title)
-        with utils.timer("tsplot: data loaded ts in"):
-            ts[variable].load()
-        plot = hv.Curve(ts[variable])
         initial_render = False
         plot = plot.opts(
             title=title,
@@ -469,6 +561,12 @@ def get_pointer_timeseries(
     title_template: str = "",
     fontscale: float = 1,
 ) -> geoviews.DynamicMap:
+    """
+    Return a ``DynamicMap`` with the timeseries of the node that is closest to the mouse pointer.
+
+    The mouse movements are throttled by HoloViews: the events that get queued while the
+    previous one is being processed are merged, and only the latest position gets rendered.
+    """
     import holoviews.streams as hv_streams
 
     dmap = _get_stream_timeseries(
@@ -480,16 +578,3 @@ def get_pointer_timeseries(
         fontscale=fontscale,
     )
     return dmap
-
-
-# def plot_timeseries(ds: xarray.DataArray, lon: float, lat: float) -> geoviews.DynamicMap:
-#     node_index = utils.get_index_of_nearest_node(ds=ds, lon=lon, lat=lat)
-#     node_lon = ds.lon.isel(node_index)
-#     node_lat = ds.lat.isel(node_index)
-#     title = f"Lon={x:.3f} Lat={y:.3f} - {node_lon}, {node_lat}"
-#     plot = (
-#         hv.Curve(ds)
-#         .redim(variable, range=(ts.min(), ts.max()))
-#         .opts(title=title, framewise=True, padding=0.05, show_grid=True)
-#     )
-#     return plot
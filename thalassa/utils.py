@@ -4,19 +4,21 @@ import logging
 import sys
 import time
 import typing as T
+import weakref
 
 import decorator
 
 
-# if T.TYPE_CHECKING:  # pragma: no cover
-import geopandas
-import geoviews
-import holoviews
-import numpy
-import numpy.typing as npt
-import pandas
-import shapely
-import xarray
+if T.TYPE_CHECKING:  # pragma: no cover
+    import geopandas
+    import geoviews
+    import holoviews
+    import numpy
+    import numpy.typing as npt
+    import pandas
+    import scipy.spatial
+    import shapely
+    import xarray
 
 
 logger = logging.getLogger(__name__)
@@ -167,19 +169,143 @@ def split_quads(face_nodes: npt.NDArray[numpy.int_]) -> npt.NDArray[numpy.int_]:
     # Append new triangles to the existing ones
     # Also cast to the proper type for Mypy
     new_face_nodes = T.cast(
-        npt.NDArray[np.int_],
+        "npt.NDArray[np.int_]",
         np.r_[existing_triangles, new_triangles].astype(int),
     )
     return new_face_nodes
     # return new_face_nodes.astype(int)
 
 
+# Objects derived from a dataset (e.g. KDTrees, polygons, trimeshes), keyed by `id(ds)`.
+# The entries get evicted as soon as the corresponding dataset gets garbage collected.
+_DATASET_CACHE: dict[int, dict[T.Hashable, T.Any]] = {}
+
+
+# The variables that define the geometry of the mesh
+MESH_VARIABLES = ("lon", "lat", "triface_nodes", "node")
+
+
+def get_dataset_cache(ds: xarray.Dataset) -> dict[T.Hashable, T.Any]:
+    """
+    Return a ``dict`` which can be used to cache objects that are derived from ``ds``.
+
+    The ``dict`` is discarded as soon as ``ds`` gets garbage collected.
+    """
+    key = id(ds)
+    cache = _DATASET_CACHE.get(key)
+    if cache is None:
+        cache = _DATASET_CACHE[key] = {}
+        weakref.finalize(ds, _DATASET_CACHE.pop, key, None)
+    return cache
+
+
+def get_cached(
+    ds: xarray.Dataset,
+    key: T.Hashable,
+    variables: T.Iterable[T.Hashable],
+    factory: T.Callable[[], T.Any],
+) -> T.Any:
+    """
+    Return the object that is cached under ``key``, creating it with ``factory()`` if necessary.
+
+    Datasets are mutable, therefore the cached object is re-created whenever any of the
+    ``variables`` it was derived from has been replaced, e.g. after ``ds["zeta"] = ...``.
+    Modifying the data of a variable in place (e.g. ``ds.zeta.values[:] = 0``) is not detected.
+    """
+    cache = get_dataset_cache(ds)
+    # Keeping references to the variables themselves (instead of their `id()`) ensures that
+    # the identity checks can't be fooled by a new variable reusing the memory of an old one.
+    dependencies = tuple(ds.variables.get(name) for name in variables)
+    entry = cache.get(key)
+    if entry is None or any(a is not b for a, b in zip(entry[0], dependencies)):
+        entry = cache[key] = (dependencies, factory())
+    return entry[1]
+
+
+def get_node_coordinates(
+    ds: xarray.Dataset,
+) -> tuple[npt.NDArray[numpy.float64], npt.NDArray[numpy.float64]]:
+    """
+    Return the longitudes and the latitudes of the nodes as C-contiguous ``float64`` arrays.
+
+    The arrays are cached, therefore the underlying storage (e.g. a netcdf file opened with
+    ``cache=False`` or a dask array) is only accessed once per dataset.
+    """
+    import numpy as np
+
+    coordinates = get_cached(
+        ds,
+        "node_coordinates",
+        ["lon", "lat"],
+        lambda: (
+            np.ascontiguousarray(ds.lon.values, dtype=np.float64),
+            np.ascontiguousarray(ds.lat.values, dtype=np.float64),
+        ),
+    )
+    return T.cast("tuple[npt.NDArray[numpy.float64], npt.NDArray[numpy.float64]]", coordinates)
+
+
+def get_triface_nodes(ds: xarray.Dataset) -> npt.NDArray[numpy.int_]:
+    """
+    Return the connectivity of the triangles as a C-contiguous integer array.
+
+    Whenever the indices fit, ``int32`` is used instead of ``int64``, which halves the size of
+    the array. The array is cached, just like in ``get_node_coordinates()``.
+    """
+    import numpy as np
+
+    dtype = np.int32 if ds.sizes["node"] <= np.iinfo(np.int32).max else np.int64
+    triface_nodes = get_cached(
+        ds,
+        "triface_nodes",
+        ["triface_nodes"],
+        lambda: np.ascontiguousarray(ds.triface_nodes.values, dtype=dtype),
+    )
+    return T.cast("npt.NDArray[numpy.int_]", triface_nodes)
+
+
+def _get_vertices(ds: xarray.Dataset, indices: npt.NDArray[numpy.int_]) -> npt.NDArray[numpy.int_]:
+    """
+    Map the ``indices`` of the ``triface_nodes`` to the positions of the nodes.
+
+    ``ds.node`` is almost always ``arange(N)``, in which case this is a no-op and we skip the
+    (potentially huge) gather. Whether this is the case is only checked once per dataset.
+    """
+    import pandas as pd
+
+    def is_default_node_index() -> bool:
+        # This is O(1) if the index is a `RangeIndex`
+        index = ds.get_index("node")
+        return index.equals(pd.RangeIndex(len(index)))
+
+    if get_cached(ds, "default_node_index", ["node"], is_default_node_index):
+        return indices
+    return T.cast("npt.NDArray[numpy.int_]", ds.node.data[indices])
+
+
+def _get_kdtree(ds: xarray.Dataset) -> scipy.spatial.cKDTree:
+    """
+    Return a ``cKDTree`` of the nodes of ``ds``.
+
+    The tree is only built on the first call. Subsequent calls with the same dataset
+    return the cached instance.
+    """
+    import numpy as np
+    from scipy.spatial import cKDTree
+
+    def create_kdtree() -> scipy.spatial.cKDTree:
+        points = np.column_stack(get_node_coordinates(ds))
+        return cKDTree(points, leafsize=16, balanced_tree=True, compact_nodes=True)
+
+    return T.cast("scipy.spatial.cKDTree", get_cached(ds, "kdtree", ["lon", "lat"], create_kdtree))
+
+
 def get_index_of_nearest_node(ds: xarray.Dataset, lon: float, lat: float) -> int:
     # https://www.unidata.ucar.edu/blogs/developer/en/entry/accessing_netcdf_data_by_coordinates
     # https://github.com/Unidata/python-workshop/blob/fall-2016/notebooks/netcdf-by-coordinates.ipynb
-    dist = abs(ds.lon - lon) ** 2 + abs(ds.lat - lat) ** 2
-    index_of_nearest_node = int(dist.argmin())
-    return index_of_nearest_node
+    # Instead of computing the distance of each node, we query a (cached) KDTree
+    _, index_of_nearest_node = _get_kdtree(ds).query((lon, lat), k=1)
+    return int(index_of_nearest_node)
 
 
 def drop_elements_crossing_idl(
@@ -276,80 +402,189 @@ def is_point_in_the_raster(raster: geoviews.DynamicMap, lon: float, lat: float)
 
     raster_dataset = raster.values()[0].data
     data_var_name = raster.ddims[-1].name
-    interpolated = raster_dataset[data_var_name].interp(dict(lon=lon, lat=lat)).data
-    return T.cast(bool, ~np.isnan(interpolated))
+    # Look up the pixel that contains the point using plain numpy.
+    # `xarray.Dataset.interp()` is much slower and this gets called on every mouse move.
+    ix = _get_index_of_nearest_pixel(raster_dataset.lon.values, lon)
+    iy = _get_index_of_nearest_pixel(raster_dataset.lat.values, lat)
+    if ix is None or iy is None:
+        return False
+    value = raster_dataset[data_var_name].transpose("lat", "lon").values[iy, ix]
+    return T.cast(bool, ~np.isnan(value))
 
 
-def generate_mesh_polygon(ds: xarray.Dataset) -> geopandas.GeoDataFrame:
-    """Return a ``geopandas.GeoDataFrame`` containing the union of all the polygons"""
-    import geopandas as gpd
+def _get_index_of_nearest_pixel(axis: npt.NDArray[numpy.float_], value: float) -> int | None:
+    """
+    Return the index of the element of the (ascending) ``axis`` that is closest to ``value``.
+
+    Return ``None`` if ``value`` is outside of the ``axis``.
+    """
     import numpy as np
-    import shapely
 
-    logger.debug("Starting polygon generation")
-    # Get the indexes of the nodes
-    triface_nodes = ds.triface_nodes.data
-    nodes = ds.node.data
-    first_nodes = nodes[triface_nodes[:, 0]]
-    second_nodes = nodes[triface_nodes[:, 1]]
-    third_nodes = nodes[triface_nodes[:, 2]]
-    del triface_nodes
-    del nodes
-
-    lons = ds.lon.data
-    lats = ds.lat.data
-    first_lons = lons[first_nodes]
-    second_lons = lons[second_nodes]
-    third_lons = lons[third_nodes]
-    del lons
-
-    lats = ds.lat.data
-    first_lats = lats[first_nodes]
-    second_lats = lats[second_nodes]
-    third_lats = lats[third_nodes]
-    del lats
-    del first_nodes
-    del second_nodes
-    del third_nodes
-
-    # Stack the coords, one polygon per line
-    polygons_per_line = np.vstack(
-        (
-            first_lons,
-            first_lats,
-            second_lons,
-            second_lats,
-            third_lons,
-            third_lats,
-            first_lons,
-            first_lats,
-        ),
-    ).T
+    if not len(axis) or not (axis[0] <= value <= axis[-1]):
+        return None
+    index = int(np.searchsorted(axis, value))
+    if index > 0 and value - axis[index - 1] <= axis[index] - value:
+        index -= 1
+    return index
+
+
+def _get_boundary_edges(triface_nodes: npt.NDArray[numpy.int_]) -> npt.NDArray[numpy.int_] | None:
+    """
+    Return the edges that belong to exactly one triangle, i.e. the boundary of the mesh.
+
+    If the triangulation is not conforming (i.e. there are edges shared by more than two
+    triangles), then return ``None``.
+    """
+    import numpy as np
 
-    # Re-stack the polygon coords. This time we should have 4 points per line
-    polygons_coords = np.stack(
+    edges = np.concatenate(
         (
-            polygons_per_line[:, :2],
-            polygons_per_line[:, 2:4],
-            polygons_per_line[:, 4:6],
-            polygons_per_line[:, 6:8],
+            triface_nodes[:, [0, 1]],
+            triface_nodes[:, [1, 2]],
+            triface_nodes[:, [2, 0]],
         ),
-        axis=1,
-    )
-    # sanity check
-    if polygons_coords.shape[1:] != (4, 2):
-        raise ValueError("Something went wrong")
-    del polygons_per_line
+    ).astype(np.int64)
+    edges.sort(axis=1)
+    # Encode each edge as a single integer so that `np.unique` can count them.
+    # This is much faster than using a structured dtype (or `axis=0`).
+    base = edges.max(initial=0) + 1
+    unique_keys, counts = np.unique(edges[:, 0] * base + edges[:, 1], return_counts=True)
+    if (counts > 2).any():
+        return None
+    boundary_keys = unique_keys[counts == 1]
+    boundary_edges = np.column_stack(np.divmod(boundary_keys, base))
+    return T.cast("npt.NDArray[np.int_]", boundary_edges)
+
+
+def _polygonize_boundary(
+    lons: npt.NDArray[numpy.float_],
+    lats: npt.NDArray[numpy.float_],
+    boundary_edges: npt.NDArray[numpy.int_],
+) -> shapely.Geometry | None:
+    """
+    Stitch the boundary edges of the mesh back to (multi)polygon(s).
+
+    Return ``None`` if the edges can't be polygonized cleanly.
+    """
+    import numpy as np
+    import shapely
+
+    lines = shapely.linestrings(np.stack((lons[boundary_edges], lats[boundary_edges]), axis=-1))
+    polygons, cuts, dangles, invalid_rings = shapely.polygonize_full(lines)
+    if not (shapely.is_empty(cuts) and shapely.is_empty(dangles) and shapely.is_empty(invalid_rings)):
+        return None
+    faces = shapely.get_parts(polygons)
+    # `polygonize` returns all the faces of the planar graph, i.e. the holes of the mesh
+    # (e.g. islands) are returned as polygons, too. We use the even-odd rule to drop them:
+    # a face whose representative point is inside an odd number of *other* shells is a hole.
+    shells = shapely.polygons(shapely.get_exterior_ring(faces))
+    points = shapely.point_on_surface(faces)
+    point_indices, _ = shapely.STRtree(shells).query(points, predicate="within")
+    depth = np.bincount(point_indices, minlength=len(faces)) - 1
+    polygon = shapely.union_all(faces[depth % 2 == 0])
+    return polygon
+
+
+def _get_triangle_coords(ds: xarray.Dataset) -> npt.NDArray[numpy.float_]:
+    """
+    Return an ``(F, 4, 2)`` array with the coordinates of the closed rings of the triangles.
+    """
+    import numpy as np
+
+    from ._kernels import pack_triangle_coords
 
+    lons, lats = get_node_coordinates(ds)
+    vertices = _get_vertices(ds, get_triface_nodes(ds))
+    coords = np.empty((len(vertices), 4, 2), dtype=np.float64)
+    # A single parallel pass, without the temporaries of the fancy indexing
+    pack_triangle_coords(np.ascontiguousarray(vertices), lons, lats, coords)
+    return coords
+
+
+def _get_triangles_area(ds: xarray.Dataset) -> float:
+    """Return the sum of the areas of the triangles of the mesh."""
+    import numpy as np
+
+    lons, lats = get_node_coordinates(ds)
+    vertices = _get_vertices(ds, get_triface_nodes(ds))
+    x = lons[vertices]
+    y = lats[vertices]
+    doubled_areas: npt.NDArray[numpy.float64] = (x[:, 1] - x[:, 0]) * (y[:, 2] - y[:, 0]) - (
+        x[:, 2] - x[:, 0]
+    ) * (y[:, 1] - y[:, 0])
+    return float(np.abs(doubled_areas).sum() / 2)
+
+
+def _get_mesh_polygon(ds: xarray.Dataset) -> shapely.Geometry:
+    import numpy as np
+    import shapely
+
+    logger.debug("Starting polygon generation")
+    # For a conforming triangulation, the outline of the mesh consists of the edges that
+    # belong to a single triangle. Finding them is much cheaper than unioning all the triangles.
+    boundary_edges = _get_boundary_edges(get_triface_nodes(ds))
+    if boundary_edges is not None:
+        lons, lats = get_node_coordinates(ds)
+        polygon = _polygonize_boundary(lons, lats, _get_vertices(ds, boundary_edges))
+        # If the triangles overlap, the traced outline is wrong even if it can be polygonized.
+        # This is cheap to detect: either the outline is not valid or its area differs from the
+        # area of the triangles.
+        if (
+            polygon is not None
+            and shapely.is_valid(polygon)
+            and np.isclose(polygon.area, _get_triangles_area(ds), rtol=1e-6)
+        ):
+            return polygon
+    logger.debug("Couldn't trace the mesh boundary, falling back to unioning the triangles")
+
+    polygons_coords = _get_triangle_coords(ds)
     polygons = shapely.polygons(polygons_coords)
-    polygon = shapely.coverage_union_all(polygons)
-    del polygons
+    try:
+        polygon = shapely.coverage_union_all(polygons)
+    except shapely.errors.GEOSException:
+        polygon = None
+    if polygon is None or not shapely.is_valid(polygon):
+        # The triangles are not a valid coverage (e.g. they overlap or they are not noded
+        # correctly), therefore we need to do a full union.
+        logger.debug("The triangles are not a valid coverage, falling back to a full union")
+        polygon = shapely.union_all(polygons)
+    return polygon
+
+
+def _get_cached_mesh_polygon(ds: xarray.Dataset) -> shapely.Geometry:
+    import shapely
+
+    def create_mesh_polygon() -> shapely.Geometry:
+        polygon = _get_mesh_polygon(ds)
+        # Preparing the geometry makes the subsequent point-in-polygon tests much faster
+        shapely.prepare(polygon)
+        return polygon
+
+    return T.cast("shapely.Geometry", get_cached(ds, "mesh_polygon", MESH_VARIABLES, create_mesh_polygon))
 
-    # convert to GeoDataFrame
-    gdf = gpd.GeoDataFrame(geometry=[polygon])
+
+def generate_mesh_polygon(ds: xarray.Dataset) -> geopandas.GeoDataFrame:
+    """Return a ``geopandas.GeoDataFrame`` containing the union of all the polygons"""
+    import geopandas as gpd
+
+    # The shapely geometry is passed directly to GeoPandas, no serialization is involved.
+    gdf = gpd.GeoDataFrame(geometry=[_get_cached_mesh_polygon(ds)], crs="EPSG:4326")
     return gdf
 
 
+def is_point_in_the_mesh(ds: xarray.Dataset, lon: float, lat: float) -> bool:
+    """
+    Return ``True`` if the point is inside the mesh of ``ds``, ``False`` otherwise.
+
+    Unlike ``is_point_in_the_raster()``, the result does not depend on the zoom level.
+    The mesh polygon is generated on the first call and it is cached.
+    """
+    import shapely
+
+    polygon = _get_cached_mesh_polygon(ds)
+    return bool(shapely.contains_xy(polygon, lon, lat))
+
+
 @decorator.contextmanager
 def timer(
     msg: str = "",